@@ -3,7 +3,7 @@ import logging
 import os
 import shutil
 import tempfile
-from typing import Any, Callable, Dict, Generator, List, Optional, Tuple
+from typing import Any, Callable, Dict, Generator, Iterable, List, Optional, Set, Tuple
 
 import yaml
 
@@ -92,6 +92,33 @@ def register_cre(cre: defs.CRE, collection: db.Standard_collection) -> db.CRE:
     return dbcre
 
 
+def add_documents_bulk(
+    documents: Iterable[defs.Document], collection: db.Standard_collection
+) -> None:
+    """adds every CRE and standard reachable from documents in a few statements,
+    in the order register_cre/register_standard would add them,
+    so registering the documents afterwards only has to add the links"""
+    cres: List[defs.CRE] = []
+    standards: List[defs.Standard] = []
+    seen: Set[int] = set()
+
+    def collect(document: defs.Document) -> None:
+        if id(document) in seen:
+            return
+        seen.add(id(document))
+        if type(document) == defs.CRE:
+            cres.append(document)
+        elif type(document) == defs.Standard:
+            standards.append(document)
+        for link in document.links:
+            collect(link.document)
+
+    for document in documents:
+        collect(document)
+    collection.add_cres_bulk(cres)
+    collection.add_standards_bulk(standards)
+
+
 def parse_file(
     filename: str, yamldocs: List[Dict[str, Any]], scollection: db.Standard_collection
 ) -> Optional[List[defs.Document]]:
@@ -164,6 +191,8 @@ def parse_standards_from_spreadsheeet(
     else:
         cres = parsers.parse_v0_standards(cre_file)
 
+    add_documents_bulk(list(cres.values()) + list(hi_lvl_CREs.values()), result)
+
     # register groupless cres first
     for _, cre in cres.items():
         register_cre(cre, result)
@@ -201,8 +230,9 @@ def add_from_spreadsheet(spreadsheet_url: str, cache_loc: str, cre_loc: str) ->
     spreadsheet = sheet_utils.readSpreadsheet(
         url=spreadsheet_url, cres_loc=cre_loc, alias="new spreadsheet", validate=False
     )
-    for worksheet, contents in spreadsheet.items():
-        parse_standards_from_spreadsheeet(contents, database)
+    with database.bulk():
+        for worksheet, contents in spreadsheet.items():
+            parse_standards_from_spreadsheeet(contents, database)
 
     database.export(cre_loc)
 
@@ -218,13 +248,14 @@ def add_from_disk(cache_loc: str, cre_loc: str) -> None:
     export db to ../../cres/
     """
     database = db_connect(path=cache_loc)
-    for file in get_standards_files_from_disk(cre_loc):
-        with open(file, "rb") as standard:
-            parse_file(
-                filename=file,
-                yamldocs=list(yaml.safe_load_all(standard)),
-                scollection=database,
-            )
+    with database.bulk():
+        for file in get_standards_files_from_disk(cre_loc):
+            with open(file, "rb") as standard:
+                parse_file(
+                    filename=file,
+                    yamldocs=list(yaml.safe_load_all(standard)),
+                    scollection=database,
+                )
     docs = database.export(cre_loc)
 
 
@@ -240,8 +271,9 @@ def review_from_spreadsheet(cache: str, spreadsheet_url: str, share_with: str) -
     spreadsheet = sheet_utils.readSpreadsheet(
         url=spreadsheet_url, cres_loc=loc, alias="new spreadsheet", validate=False
     )
-    for _, contents in spreadsheet.items():
-        parse_standards_from_spreadsheeet(contents, database)
+    with database.bulk():
+        for _, contents in spreadsheet.items():
+            parse_standards_from_spreadsheeet(contents, database)
     docs = database.export(loc)
 
     sheet_url = create_spreadsheet(
@@ -266,13 +298,14 @@ def review_from_disk(cache: str, cre_file_loc: str, share_with: str) -> None:
     """
     loc, cache = prepare_for_review(cache)
     database = db_connect(path=cache)
-    for file in get_standards_files_from_disk(cre_file_loc):
-        with open(file, "rb") as standard:
-            parse_file(
-                filename=file,
-                yamldocs=list(yaml.safe_load_all(standard)),
-                scollection=database,
-            )
+    with database.bulk():
+        for file in get_standards_files_from_disk(cre_file_loc):
+            with open(file, "rb") as standard:
+                parse_file(
+                    filename=file,
+                    yamldocs=list(yaml.safe_load_all(standard)),
+                    scollection=database,
+                )
 
     docs = database.export(loc)
     sheet_url = create_spreadsheet(
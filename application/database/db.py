@@ -1,13 +1,31 @@
 import logging
 import re
-from collections import Counter
-from itertools import permutations
-from typing import Any, Dict, List, Optional, Tuple
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import chain, permutations
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
 
 import networkx as nx  # type: ignore
 import yaml
 from flask_sqlalchemy.model import DefaultMeta
-from sqlalchemy import func
+from sqlalchemy import event, func
+from sqlalchemy.orm import (
+    joinedload,
+    raiseload,
+    selectinload,
+    validates,
+)
+from sqlalchemy.orm.util import identity_key
 
 from application.defs import cre_defs
 from application.utils import file  # type: ignore
@@ -21,6 +39,88 @@ logger.setLevel(logging.INFO)
 
 BaseModel: DefaultMeta = sqla.Model
 
+# how many rows the add_*_bulk methods send to the database per statement
+BULK_INSERT_BATCH_SIZE = 1000
+# how many names they look up per statement,
+# sqlite before 3.32 allows at most 999 parameters in a statement
+BULK_LOOKUP_BATCH_SIZE = 500
+
+# how many links export() loads from the database at a time
+EXPORT_BATCH_SIZE = 500
+# how many threads export() uses to write files
+EXPORT_WRITERS = 8
+# libyaml's dumper is much faster, fall back to the python one if it's not available
+YamlDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+# cre_graph nodes are ("C", cre id) or ("S", standard id)
+GraphNode = Tuple[str, int]
+
+# text_search shortcuts
+CRE_ID_SEARCH = re.compile(r"CRE(:| )(?P<id>\d+-\d+)", re.IGNORECASE)
+CRE_NAKED_ID_SEARCH = re.compile(r"\d\d\d-\d\d\d")
+CRE_NAME_SEARCH = re.compile(r"CRE(:| )(?P<name>\w+)", re.IGNORECASE)
+# val2 runs to the end of the line, a third value group after it could never match
+STANDARD_SEARCH = re.compile(
+    r"Standard(?:[: ](?P<link>https?://\S+))?(?:[: ](?P<val1>\w+))?(?:[: ](?P<val2>.+))?",
+    re.IGNORECASE,
+)
+# the structured searches in the order text_search tries them
+STRUCTURED_SEARCHES = (
+    ("cre_id", CRE_ID_SEARCH),
+    ("cre_naked_id", CRE_NAKED_ID_SEARCH),
+    ("cre_name", CRE_NAME_SEARCH),
+    ("standard", STANDARD_SEARCH),
+)
+# all of them in one pattern matched once, each alternative looks ahead for the
+# first match of its search anywhere in the text and they are tried in order,
+# so the kind that matches is the one the searches would find one by one
+STRUCTURED_SEARCH = re.compile(
+    "|".join(
+        f"(?=(?s:.*?)(?P<{kind}>{search.pattern}))"
+        for kind, search in STRUCTURED_SEARCHES
+    ),
+    re.IGNORECASE,
+)
+# most documents a fuzzy text_search returns, short text can match most of the database
+TEXT_SEARCH_MAX_RESULTS = 100
+
+# bumped whenever the session writes to (or rolls back) the database
+# or the tables are created or dropped
+_db_generation = 0
+# values computed by Standard_collection, shared by all its instances since the web app
+# creates one per request, each value is only valid for the generation it was computed in.
+# Writes made by other processes are not seen, the web app serves a database written by the cli
+_cache: Dict[str, Tuple[int, Any]] = {}
+
+
+@event.listens_for(sqla.session, "after_flush")
+@event.listens_for(sqla.session, "after_bulk_update")
+@event.listens_for(sqla.session, "after_rollback")
+@event.listens_for(sqla.Model.metadata, "after_create")
+@event.listens_for(sqla.Model.metadata, "after_drop")
+def _bump_db_generation(*args: Any, **kwargs: Any) -> None:
+    global _db_generation
+    _db_generation += 1
+
+
+class TagSet(sqla.TypeDecorator):  # type: ignore
+    """Tags stored coma separated and loaded as a frozenset,
+    so they are split once per row instead of on every conversion.
+    Strings are stored as they are, they are LIKE patterns,
+    models turn tags assigned as strings into frozensets with _tag_set"""
+
+    impl = sqla.String
+
+    def process_bind_param(self, value: Any, dialect: Any) -> Optional[str]:
+        if value is None or isinstance(value, str):
+            return value
+        return ",".join(sorted(value))
+
+    def process_result_value(
+        self, value: Optional[str], dialect: Any
+    ) -> FrozenSet[str]:
+        return _tag_set(value)
+
 
 class Standard(BaseModel):  # type: ignore
 
@@ -32,15 +132,31 @@ class Standard(BaseModel):  # type: ignore
     section = sqla.Column(sqla.String, nullable=False)
     # which subpart of <name> are we linking to
     subsection = sqla.Column(sqla.String)
-    tags = sqla.Column(sqla.String, default="")  # coma separated tags
+    tags = sqla.Column(TagSet, default="")
     version = sqla.Column(sqla.String, default="")
 
     # some external link to where this is, usually a URL with an anchor
     link = sqla.Column(sqla.String, default="")
     __table_args__ = (
         sqla.UniqueConstraint(name, section, subsection, name="standard_section"),
+        # lookups compare lowercased values, index those instead of the raw columns
+        sqla.Index(
+            "ix_standard_lower_name_section_subsection_version",
+            func.lower(name),
+            func.lower(section),
+            func.lower(subsection),
+            func.lower(version),
+        ),
+        sqla.Index("ix_standard_lower_section", func.lower(section)),
+        sqla.Index("ix_standard_lower_subsection", func.lower(subsection)),
     )
 
+    links = sqla.relationship("Links", back_populates="standard_rel")
+
+    @validates("tags")
+    def validate_tags(self, key: str, tags: Any) -> FrozenSet[str]:
+        return _tag_set(tags)
+
 
 class CRE(BaseModel):  # type: ignore
 
@@ -50,10 +166,29 @@ class CRE(BaseModel):  # type: ignore
     external_id = sqla.Column(sqla.String, default="")
     description = sqla.Column(sqla.String, default="")
     name = sqla.Column(sqla.String)
-    tags = sqla.Column(sqla.String, default="")  # coma separated tags
+    tags = sqla.Column(TagSet, default="")
 
     __table_args__ = (
         sqla.UniqueConstraint(name, external_id, name="unique_cre_fields"),
+        # lookups compare lowercased names, index those instead of the raw column
+        sqla.Index("ix_cre_lower_name", func.lower(name)),
+        # the unique constraint leads with name, CREs are also looked up by id alone
+        sqla.Index("ix_cre_external_id", external_id),
+    )
+
+    links = sqla.relationship("Links", back_populates="cre_rel")
+
+    @validates("tags")
+    def validate_tags(self, key: str, tags: Any) -> FrozenSet[str]:
+        return _tag_set(tags)
+
+    # internal links where this CRE is the group/higher level CRE
+    internal_out = sqla.relationship(
+        "InternalLinks", foreign_keys="InternalLinks.group", back_populates="group_rel"
+    )
+    # internal links where this CRE is the lower level CRE
+    internal_in = sqla.relationship(
+        "InternalLinks", foreign_keys="InternalLinks.cre", back_populates="cre_rel"
     )
 
 
@@ -64,6 +199,14 @@ class InternalLinks(BaseModel):  # type: ignore
 
     group = sqla.Column(sqla.Integer, sqla.ForeignKey("cre.id"), primary_key=True)
     cre = sqla.Column(sqla.Integer, sqla.ForeignKey("cre.id"), primary_key=True)
+    # the primary key covers lookups by group, CRE.internal_in looks up by cre
+    __table_args__ = (sqla.Index("ix_crelinks_cre", cre),)
+
+    # both columns point to the same table so the join has to be spelled out
+    group_rel = sqla.relationship(
+        "CRE", foreign_keys=[group], back_populates="internal_out"
+    )
+    cre_rel = sqla.relationship("CRE", foreign_keys=[cre], back_populates="internal_in")
 
 
 class Links(BaseModel):  # type: ignore
@@ -74,49 +217,243 @@ class Links(BaseModel):  # type: ignore
     standard = sqla.Column(
         sqla.Integer, sqla.ForeignKey("standard.id"), primary_key=True
     )
+    # the primary key covers lookups by cre, Standard.links looks up by standard
+    __table_args__ = (sqla.Index("ix_links_standard", standard),)
+
+    cre_rel = sqla.relationship("CRE", back_populates="links")
+    standard_rel = sqla.relationship("Standard", back_populates="links")
+
+
+# the collections holding the links of each kind of document
+LINK_COLLECTIONS = {
+    CRE: ["links", "internal_out", "internal_in"],
+    Standard: ["links"],
+}
+
+
+@event.listens_for(sqla.session, "after_flush")
+def _track_changed_links(session: Any, flush_context: Any) -> None:
+    """links are added by id, so the collections of the documents they link
+    are not updated, remember the documents for the read queries to reload"""
+    changed = session.info.setdefault("changed_link_documents", set())
+    for link in chain(session.new, session.deleted):
+        if isinstance(link, Links):
+            changed.update(((CRE, link.cre), (Standard, link.standard)))
+        elif isinstance(link, InternalLinks):
+            changed.update(((CRE, link.group), (CRE, link.cre)))
+
+
+# sqlite keeps trigram full text indexes of the columns text_search matches fuzzily,
+# a trigram phrase query finds the same substrings as LIKE '%text%' without a table scan
+FTS_COLUMNS = {
+    Standard.__tablename__: ("name", "section", "subsection", "link"),
+    CRE.__tablename__: ("name", "external_id", "description"),
+}
+# the trigram tokenizer needs at least 3 characters to match anything
+FTS_MIN_LENGTH = 3
+
+
+def _fts_statements(table: str) -> List[str]:
+    """Returns the statements creating the full text index of table
+    and the triggers that keep it in sync with table"""
+    columns = ", ".join(FTS_COLUMNS[table])
+    new = ", ".join(f"new.{c}" for c in FTS_COLUMNS[table])
+    old = ", ".join(f"old.{c}" for c in FTS_COLUMNS[table])
+    delete = f"INSERT INTO {table}_fts({table}_fts, rowid, {columns}) VALUES('delete', old.id, {old});"
+    insert = f"INSERT INTO {table}_fts(rowid, {columns}) VALUES (new.id, {new});"
+    return [
+        f"CREATE VIRTUAL TABLE {table}_fts USING fts5({columns}, "
+        f"content='{table}', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER {table}_fts_ai AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER {table}_fts_ad AFTER DELETE ON {table} BEGIN {delete} END",
+        f"CREATE TRIGGER {table}_fts_au AFTER UPDATE ON {table} BEGIN {delete} {insert} END",
+    ]
+
+
+def _fts_supported(connection: Any) -> bool:
+    # the trigram tokenizer arrived in sqlite 3.34, and FTS5 is optional at compile time
+    if connection.dialect.name != "sqlite" or sqlite3.sqlite_version_info < (3, 34):
+        return False
+    return bool(
+        connection.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar()
+    )
+
+
+def _create_fts(table: sqla.Table, connection: Any, **kw: Any) -> None:
+    if _fts_supported(connection):
+        for statement in _fts_statements(table.name):
+            connection.execute(statement)
+
+
+def _drop_fts(table: sqla.Table, connection: Any, **kw: Any) -> None:
+    # the index outlives its content table otherwise, dropping the table drops the triggers
+    if _fts_supported(connection):
+        connection.execute(f"DROP TABLE IF EXISTS {table.name}_fts")
+
+
+for _table in (Standard.__table__, CRE.__table__):
+    event.listen(_table, "after_create", _create_fts)
+    event.listen(_table, "before_drop", _drop_fts)
 
 
 class Standard_collection:
-    def __init__(self) -> None:
+    def __init__(self, raise_on_lazy: bool = False) -> None:
+        """raise_on_lazy makes the read queries raise on any relationship
+        they did not load eagerly, tests use it to catch N+1 queries"""
         self.session = sqla.session
-        self.cre_graph = self.__load_cre_graph()
+        self.__raise_on_lazy = raise_on_lazy
+        self.__cre_graph: Optional[nx.DiGraph] = None
+        # the graph comes from the cache, it is copied before this instance changes it
+        self.__owns_graph = False
+        self.__in_bulk = False
+        self.__has_fts: Optional[bool] = None
+
+    @contextmanager
+    def bulk(self) -> Iterator[None]:
+        """Groups all writes in the block into a single transaction,
+        inside it the add_* methods only flush and the commit happens once at the end.
+        If the block raises, everything it wrote is rolled back"""
+        if self.__in_bulk:  # nested, the outermost block commits
+            yield
+            return
+        self.__in_bulk = True
+        try:
+            yield
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            # the graph may contain links that were just rolled back
+            self.__cre_graph = None
+            self.__owns_graph = False
+            raise
+        finally:
+            self.__in_bulk = False
+
+    def __commit(self) -> None:
+        if self.__in_bulk:
+            self.session.flush()
+        else:
+            self.session.commit()
 
-    def __load_cre_graph(self) -> nx.Graph:
+    def __cached(self, key: str, compute: Callable[[], Any]) -> Any:
+        """returns the memoized result of compute() as long as
+        nothing has been written to the database since it was computed"""
+        generation = _db_generation
+        cached_generation, value = _cache.get(key, (-1, None))
+        if cached_generation == generation:
+            # the add_* methods flush as they go, anything pending was changed
+            # directly in the session and is not in the cached value,
+            # compute() autoflushes it like any uncached query would
+            if not (self.session.new or self.session.dirty or self.session.deleted):
+                return value
+        value = compute()
+        # computing may have flushed pending changes or raced with another write
+        if _db_generation == generation:
+            _cache[key] = (generation, value)
+        return value
+
+    @property
+    def cre_graph(self) -> nx.DiGraph:
+        """the graph is only needed when adding links or looking for paths,
+        so it gets loaded the first time it is used instead of on every instantiation"""
+        if self.__cre_graph is None:
+            self.__cre_graph = self.__cached("cre_graph", self.__load_cre_graph)
+        return self.__cre_graph
+
+    def __writable_cre_graph(self) -> nx.DiGraph:
+        """the graph other instances may be reading, copied the first time it changes"""
+        if not self.__owns_graph:
+            graph = self.cre_graph.copy()
+            if "components" in graph.graph:
+                graph.graph["components"] = dict(graph.graph["components"])
+            self.__cre_graph = graph
+            self.__owns_graph = True
+        return self.cre_graph
+
+    def __add_graph_edge(self, node_from: GraphNode, node_to: GraphNode) -> None:
+        graph = self.__writable_cre_graph()
+        graph.add_edge(node_from, node_to)
+        if "components" in graph.graph:
+            # merge the components of both ends instead of recomputing all of them
+            parents = graph.graph["components"]
+            parents.setdefault(node_from, node_from)
+            parents.setdefault(node_to, node_to)
+            parents[_find_root(parents, node_from)] = _find_root(parents, node_to)
+
+    def __component(self, node: GraphNode) -> Optional[GraphNode]:
+        """Returns the node representing the connected component of node,
+        or None if nothing links to it.
+        The components are computed once per graph, kept with it as a union-find forest
+        over the linked nodes and then kept up to date by __add_graph_edge"""
+        graph = self.cre_graph
+        if "components" not in graph.graph:
+            parents = {}
+            # weak components ignore edge direction without
+            # building an undirected copy of the graph
+            for component in nx.weakly_connected_components(graph):
+                root = next(iter(component))
+                for member in component:
+                    parents[member] = root
+            graph.graph["components"] = parents
+        parents = graph.graph["components"]
+        if node not in parents:
+            return None
+        return _find_root(parents, node)
+
+    def __load_cre_graph(self) -> nx.DiGraph:
 
         graph = nx.DiGraph()
-        for il in self.session.query(InternalLinks).all():
-            graph.add_node(f"CRE: {il.group}")
-            graph.add_node(f"CRE: {il.cre}")
-            graph.add_edge(f"CRE: {il.group}", f"CRE: {il.cre}")
-
-        for lnk in self.session.query(Links).all():
-            graph.add_node(f"Standard: {str(lnk.standard)}")
-            graph.add_edge(f"CRE: {lnk.cre}", f"Standard: {str(lnk.standard)}")
+        # add_edges_from adds any missing nodes along with the edges
+        graph.add_edges_from(
+            (("C", group), ("C", cre))
+            for group, cre in self.session.query(
+                InternalLinks.group, InternalLinks.cre
+            ).yield_per(1000)
+        )
+        graph.add_edges_from(
+            (("C", cre), ("S", standard))
+            for cre, standard in self.session.query(
+                Links.cre, Links.standard
+            ).yield_per(1000)
+        )
+
+        try:
+            existing_cycle = nx.find_cycle(graph)
+            logger.fatal(
+                "Existing graph contains cycle,"
+                "this not a recoverable error,"
+                f" manual database actions are required {existing_cycle}"
+            )
+            raise ValueError(
+                "Existing graph contains cycle,"
+                "this not a recoverable error,"
+                f" manual database actions are required {existing_cycle}"
+            )
+        except nx.exception.NetworkXNoCycle:
+            pass  # happy path, we don't want cycles
         return graph
 
-    def __get_external_links(self) -> List[Tuple[CRE, Standard, str]]:
-        external_links: List[Tuple[CRE, Standard, str]] = []
+    def __eager(self, query: sqla.Query) -> sqla.Query:
+        """applied after the eager loading options of the read queries"""
+        if self.__raise_on_lazy:
+            return query.options(raiseload("*"))
+        return query
 
-        all_links = self.session.query(Links).all()
-        for link in all_links:
-            cre = self.session.query(CRE).filter(CRE.id == link.cre).first()
-            standard = (
-                self.session.query(Standard)
-                .filter(Standard.id == link.standard)
-                .first()
+    def __get_external_links(self) -> Iterator[Tuple[CRE, Standard, str]]:
+        for link in self.__eager(
+            self.session.query(Links).options(
+                joinedload(Links.cre_rel), joinedload(Links.standard_rel)
             )
-            external_links.append((cre, standard, link.type))
-        return external_links
-
-    def __get_internal_links(self) -> List[Tuple[CRE, CRE, str]]:
+        ).yield_per(EXPORT_BATCH_SIZE):
+            yield (link.cre_rel, link.standard_rel, link.type)
 
-        internal_links = []
-        all_internal_links = self.session.query(InternalLinks).all()
-        for il in all_internal_links:
-            group = self.session.query(CRE).filter(CRE.id == il.group).first()
-            cre = self.session.query(CRE).filter(CRE.id == il.cre).first()
-            internal_links.append((group, cre, il.type))
-        return internal_links
+    def __get_internal_links(self) -> Iterator[Tuple[CRE, CRE, str]]:
+        for il in self.__eager(
+            self.session.query(InternalLinks).options(
+                joinedload(InternalLinks.group_rel), joinedload(InternalLinks.cre_rel)
+            )
+        ).yield_per(EXPORT_BATCH_SIZE):
+            yield (il.group_rel, il.cre_rel, il.type)
 
     def __get_unlinked_standards(self) -> List[Standard]:
 
@@ -135,34 +472,46 @@ class Standard_collection:
         return standards
 
     def get_standards_names(self) -> List[str]:
+        def compute() -> List[str]:
+            # this returns a tuple of (str,nothing)
+            q = self.session.query(Standard.name).distinct().all()
+            return [i[0] for i in q]
 
-        # this returns a tuple of (str,nothing)
-        q = self.session.query(Standard.name).distinct().all()
-        res = [i[0] for i in q]
-        return res
+        return list(self.__cached("standards_names", compute))
 
     def get_max_internal_connections(self) -> int:
-        q = self.session.query(InternalLinks).all()
-        grp_count = Counter([x.group for x in q]) or {0: 0}
-        cre_count = Counter([x.cre for x in q]) or {0: 0}
-        return max([max(cre_count.values()), max(grp_count.values())])
+        def compute() -> int:
+            # most links any single cre or group takes part in
+            res = 0
+            for column in (InternalLinks.group, InternalLinks.cre):
+                count = func.count(column)
+                most = (
+                    self.session.query(count)
+                    .group_by(column)
+                    .order_by(count.desc())
+                    .limit(1)
+                    .scalar()
+                )
+                res = max(res, most or 0)
+            return res
+
+        res: int = self.__cached("max_internal_connections", compute)
+        return res
 
     def find_cres_of_cre(self, cre: CRE) -> Optional[List[CRE]]:
         """returns the higher level CREs of the cre or none
         if no higher level cres link to it"""
-        cre_id = self.session.query(CRE.id).filter(CRE.name == cre.name).first()
-        links = (
-            self.session.query(InternalLinks).filter(InternalLinks.cre == cre_id).all()
+        # the links of the first CRE with that name, other CREs sharing it are ignored
+        cre_id = (
+            self.session.query(CRE.id).filter(CRE.name == cre.name).limit(1).as_scalar()
         )
-        if links:
-            result = []
-            for link in links:
-                result.append(
-                    self.session.query(CRE).filter(CRE.id == link.group).first()
-                )
-            return result
-
-        return None
+        result: List[CRE] = (
+            self.session.query(CRE)
+            .join(InternalLinks, InternalLinks.group == CRE.id)
+            .filter(InternalLinks.cre == cre_id)
+            .all()
+        )
+        return result or None
 
     def find_cres_of_standard(self, standard: Standard) -> Optional[List[CRE]]:
         """returns the CREs that link to this standard or none
@@ -183,11 +532,12 @@ class Standard_collection:
         if not standard:
 
             return None
-        result: List[CRE] = []
-        for link in (
-            self.session.query(Links).filter(Links.standard == standard.id).all()
-        ):
-            result.append(self.session.query(CRE).filter(CRE.id == link.cre).first())
+        result: List[CRE] = (
+            self.session.query(CRE)
+            .join(Links, Links.cre == CRE.id)
+            .filter(Links.standard == standard.id)
+            .all()
+        )
         return result or None
 
     def get_by_tags(self, tags: List[str]) -> List[cre_defs.Document]:
@@ -210,34 +560,11 @@ class Standard_collection:
             )
             cre_where_clause.append(sqla.and_(CRE.tags.like("%{}%".format(tag))))
 
-        standards = Standard.query.filter(*standards_where_clause).all() or []
-        for standard in standards:
-            standard = self.get_standards(
-                name=standard.name,
-                section=standard.section,
-                subsection=standard.subsection,
-                version=standard.version,
-                link=standard.link,
-            )
-            if standard:
-                documents.extend(standard)
-            else:
-                logger.fatal(
-                    "db.get_standard returned None for"
-                    "Standard %s:%s that exists, BUG!"
-                    % (standard.name, standard.section)
-                )
+        standards = self.__standards_query().filter(*standards_where_clause).all()
+        documents.extend([self.__standard_with_links(s) for s in standards])
 
-        cres = CRE.query.filter(*cre_where_clause).all() or []
-        for c in cres:
-            cre = self.get_CREs(external_id=c.external_id, name=c.name)[0]
-            if cre:
-                documents.append(cre)
-            else:
-                logger.fatal(
-                    "db.get_CRE returned None for CRE %s:%s that exists, BUG!"
-                    % (c.id, c.name)
-                )
+        cres = self.__cres_query().filter(*cre_where_clause).all()
+        documents.extend([self.__cre_with_links(c) for c in cres])
         return documents
 
     def get_standards_with_pagination(
@@ -266,25 +593,7 @@ class Standard_collection:
         total_pages = dbstands.pages
         if dbstands.items:
             for dbstand in dbstands.items:
-                standard = StandardFromDB(dbstandard=dbstand)
-                linked_cres = Links.query.filter(Links.standard == dbstand.id).all()
-                for dbcre_link in linked_cres:
-                    dbcre = CRE.query.filter(CRE.id == dbcre_link.cre).first()
-                    if dbcre:
-                        if not include_only or (
-                            include_only
-                            and (
-                                dbcre.external_id in include_only
-                                or dbcre.name in include_only
-                            )
-                        ):
-                            standard.add_link(
-                                cre_defs.Link(
-                                    ltype=cre_defs.LinkTypes.from_str(dbcre_link.type),
-                                    document=CREfromDB(dbcre),
-                                )
-                            )
-                standards.append(standard)
+                standards.append(self.__standard_with_links(dbstand, include_only))
             return total_pages, standards, dbstands
         else:
             logger.warning("Standard %s does not exist in the db" % (name))
@@ -314,24 +623,7 @@ class Standard_collection:
         dbstands = standards_query.all()
         if dbstands:
             for dbstand in dbstands:
-                standard = StandardFromDB(dbstandard=dbstand)
-                linked_cres = Links.query.filter(Links.standard == dbstand.id).all()
-                for dbcre_link in linked_cres:
-                    dbcre = CRE.query.filter(CRE.id == dbcre_link.cre).first()
-                    if not include_only or (
-                        include_only
-                        and (
-                            dbcre.external_id in include_only
-                            or dbcre.name in include_only
-                        )
-                    ):
-                        standard.add_link(
-                            cre_defs.Link(
-                                ltype=cre_defs.LinkTypes.from_str(dbcre_link.type),
-                                document=CREfromDB(dbcre),
-                            )
-                        )
-                standards.append(standard)
+                standards.append(self.__standard_with_links(dbstand, include_only))
             return standards
         else:
             logger.warning("Standard %s does not exist in the db" % (name))
@@ -349,38 +641,19 @@ class Standard_collection:
     ) -> sqla.Query:
         if not name and not section and not subsection and not link and not version:
             raise ValueError("tried to retrieve standard with no values")
-        query = Standard.query
-        if name:
-            if not partial:
-                query = Standard.query.filter(func.lower(Standard.name) == name.lower())
-            else:
-                query = Standard.query.filter(
-                    func.lower(Standard.name).like(name.lower())
-                )
-        if section:
-            if not partial:
-                query = query.filter(func.lower(Standard.section) == section.lower())
-            else:
-                query = query.filter(func.lower(Standard.section).like(section.lower()))
-        if subsection:
-            if not partial:
-                query = query.filter(
-                    func.lower(Standard.subsection) == subsection.lower()
-                )
-            else:
-                query = query.filter(
-                    func.lower(Standard.subsection).like(subsection.lower())
-                )
-        if link:
-            if not partial:
-                query = query.filter(Standard.link == link)
-            else:
-                query = query.filter(Standard.link.like(link))
-        if version:
-            if not partial:
-                query = query.filter(Standard.version == version)
-            else:
-                query = query.filter(Standard.version.like(version))
+        query = self.__standards_query()
+        # name, section and subsection match case insensitively,
+        # lowercase each argument once here instead of per filter branch
+        criteria = (
+            (func.lower(Standard.name), name and name.lower()),
+            (func.lower(Standard.section), section and section.lower()),
+            (func.lower(Standard.subsection), subsection and subsection.lower()),
+            (Standard.link, link),
+            (Standard.version, version),
+        )
+        for column, value in criteria:
+            if value:
+                query = query.filter(column.like(value) if partial else column == value)
         return query
 
     def get_CREs(
@@ -392,7 +665,7 @@ class Standard_collection:
         include_only: Optional[List[str]] = None,
     ) -> Optional[List[cre_defs.CRE]]:
         cres: Optional[List[cre_defs.CRE]] = []
-        query = CRE.query
+        query = self.__cres_query()
         if not external_id and not name and not description:
             logger.error("You need to search by external_id name or description")
             return None
@@ -425,53 +698,93 @@ class Standard_collection:
         # todo figure a way to return both the Standard
         # and the link_type for that link
         for dbcre in dbcres:
-            cre = CREfromDB(dbcre)
-            linked_standards = (
-                self.session.query(Links).filter(Links.cre == dbcre.id).all()
-            )
-            for ls in linked_standards:
-                stnd = (
-                    self.session.query(Standard)
-                    .filter(Standard.id == ls.standard)
-                    .first()
-                )
-                if not include_only or (include_only and stnd.name in include_only):
-                    cre.add_link(
+            cres.append(self.__cre_with_links(dbcre, include_only))
+        return cres
+
+    def __expire_links(self) -> None:
+        """links may have been added by id only, expire the link collections
+        of the documents they link so the read queries reload them"""
+        # not populate_existing(): it would reset the collections of results
+        # that are also loaded as link targets back to lazy loading
+        self.session.flush()
+        for model, id in self.session.info.pop("changed_link_documents", ()):
+            document = self.session.identity_map.get(identity_key(model, id))
+            if document is not None:
+                self.session.expire(document, LINK_COLLECTIONS[model])
+
+    def __standards_query(self) -> sqla.Query:
+        """Standard query that also loads the CREs linking to each standard"""
+        self.__expire_links()
+        return self.__eager(
+            Standard.query.options(
+                selectinload(Standard.links).selectinload(Links.cre_rel)
+            )
+        )
+
+    def __cres_query(self) -> sqla.Query:
+        """CRE query that also loads the standards and CREs each CRE links to"""
+        self.__expire_links()
+        return self.__eager(
+            CRE.query.options(
+                selectinload(CRE.links).selectinload(Links.standard_rel),
+                selectinload(CRE.internal_out).selectinload(InternalLinks.cre_rel),
+                selectinload(CRE.internal_in).selectinload(InternalLinks.group_rel),
+            )
+        )
+
+    def __standard_with_links(
+        self, dbstand: Standard, include_only: Optional[List[str]] = None
+    ) -> cre_defs.Standard:
+        """expects dbstand to come from __standards_query()"""
+        standard = StandardFromDB(dbstandard=dbstand)
+        for dbcre_link in dbstand.links:
+            dbcre = dbcre_link.cre_rel
+            if dbcre:
+                if not include_only or (
+                    include_only
+                    and (
+                        dbcre.external_id in include_only or dbcre.name in include_only
+                    )
+                ):
+                    standard.add_link(
                         cre_defs.Link(
-                            document=StandardFromDB(stnd),
-                            ltype=cre_defs.LinkTypes.from_str(ls.type),
+                            ltype=cre_defs.LinkTypes.from_str(dbcre_link.type),
+                            document=CREfromDB(dbcre),
                         )
                     )
-            # todo figure the query to merge the following two
-            internal_links = (
-                self.session.query(InternalLinks)
-                .filter(
-                    sqla.or_(
-                        InternalLinks.cre == dbcre.id, InternalLinks.group == dbcre.id
+        return standard
+
+    def __cre_with_links(
+        self, dbcre: CRE, include_only: Optional[List[str]] = None
+    ) -> cre_defs.CRE:
+        """expects dbcre to come from __cres_query()"""
+        cre = CREfromDB(dbcre)
+        for ls in dbcre.links:
+            stnd = ls.standard_rel
+            if not include_only or (include_only and stnd.name in include_only):
+                cre.add_link(
+                    cre_defs.Link(
+                        document=StandardFromDB(stnd),
+                        ltype=cre_defs.LinkTypes.from_str(ls.type),
                     )
                 )
-                .all()
+        for il in dbcre.internal_in:
+            ltype = cre_defs.LinkTypes.from_str(il.type)
+            # if this CRE is the lower level cre the relationship will be tagged "Contains"
+            # in that case the implicit relationship is "Is Part Of"
+            # otherwise the relationship will be "Related" and we don't need to do anything
+            if ltype == cre_defs.LinkTypes.Contains:
+                # important, this is the only implicit link we have for now
+                ltype = cre_defs.LinkTypes.PartOf
+            cre.add_link(cre_defs.Link(document=CREfromDB(il.group_rel), ltype=ltype))
+        for il in dbcre.internal_out:
+            cre.add_link(
+                cre_defs.Link(
+                    document=CREfromDB(il.cre_rel),
+                    ltype=cre_defs.LinkTypes.from_str(il.type),
+                )
             )
-            for il in internal_links:
-                q = self.session.query(CRE)
-
-                res: CRE
-                ltype = cre_defs.LinkTypes.from_str(il.type)
-
-                if il.cre == dbcre.id:
-                    res = q.filter(CRE.id == il.group).first()
-                    # if this CRE is the lower level cre the relationship will be tagged "Contains"
-                    # in that case the implicit relationship is "Is Part Of"
-                    # otherwise the relationship will be "Related" and we don't need to do anything
-                    if ltype == cre_defs.LinkTypes.Contains:
-                        # important, this is the only implicit link we have for now
-                        ltype = cre_defs.LinkTypes.PartOf
-                elif il.group == dbcre.id:
-                    res = q.filter(CRE.id == il.cre).first()
-                    ltype = cre_defs.LinkTypes.from_str(il.type)
-                cre.add_link(cre_defs.Link(document=CREfromDB(res), ltype=ltype))
-            cres.append(cre)
-        return cres
+        return cre
 
     def export(self, dir: str) -> List[cre_defs.Document]:
         """Exports the database to a CRE file collection on disk"""
@@ -538,12 +851,21 @@ class Standard_collection:
                 % (ustand.name, ustand.section, ustand.subsection, ustand.version)
             ] = ustand
 
+        # documents sharing a title share a file, the last one wins
+        files: Dict[str, str] = {}
         for _, doc in docs.items():
             title = doc.name.replace("/", "-") + ".yaml"
-            file.writeToDisk(
-                file_title=title,
-                file_content=yaml.safe_dump(doc.todict()),
-                cres_loc=dir,
+            files[title] = yaml.dump(doc.todict(), Dumper=YamlDumper)
+
+        # writing is IO bound, let a few threads do it
+        with ThreadPoolExecutor(max_workers=EXPORT_WRITERS) as executor:
+            list(  # consume the results so that write errors are raised
+                executor.map(
+                    lambda item: file.writeToDisk(
+                        file_title=item[0], file_content=item[1], cres_loc=dir
+                    ),
+                    files.items(),
+                )
             )
 
         return list(docs.values())
@@ -562,17 +884,7 @@ class Standard_collection:
 
         if entry is not None:
             logger.debug("knew of %s ,updating" % cre.name)
-            if not entry.external_id:
-                if entry.external_id != cre.id:
-                    raise ValueError(
-                        f"Attempting to register existing CRE"
-                        f"{entry.external_id}:{entry.name} with other ID {cre.id}"
-                    )
-                entry.external_id = cre.id
-            if not entry.description:
-                entry.description = cre.description
-            if not entry.tags:
-                entry.tags = ",".join(cre.tags)
+            _update_cre(entry, cre)
             return entry
         else:
             logger.debug("did not know of %s ,adding" % cre.name)
@@ -580,11 +892,12 @@ class Standard_collection:
                 description=cre.description,
                 name=cre.name,
                 external_id=cre.id,
-                tags=",".join([str(t) for t in cre.tags]),
+                tags=_tag_set(cre.tags),
             )
             self.session.add(entry)
-            self.session.commit()
-            self.cre_graph.add_node(f"CRE: {entry.id}")
+            self.__commit()
+            if self.__cre_graph is not None:
+                self.__writable_cre_graph().add_node(("C", entry.id))
         return entry
 
     def add_standard(self, standard: cre_defs.Standard) -> Standard:
@@ -598,8 +911,10 @@ class Standard_collection:
         ).first()
         if entry is not None:
             logger.debug(f"knew of {entry.name}:{entry.section} ,updating")
-            entry.link = standard.hyperlink
-            self.session.commit()
+            # re-adding a known standard is common on imports, skip the no-op commit
+            if entry.link != standard.hyperlink:
+                entry.link = standard.hyperlink
+                self.__commit()
             return entry
         else:
             logger.debug(f"did not know of {standard.name}:{standard.section} ,adding")
@@ -609,35 +924,146 @@ class Standard_collection:
                 subsection=standard.subsection,
                 link=standard.hyperlink,
                 version=standard.version,
-                tags=",".join([str(t) for t in standard.tags]),
+                tags=_tag_set(standard.tags),
             )
             self.session.add(entry)
-            self.session.commit()
-            self.cre_graph.add_node("Standard: " + str(entry.id))
+            self.__commit()
+            if self.__cre_graph is not None:
+                self.__writable_cre_graph().add_node(("S", entry.id))
         return entry
 
-    def __introduces_cycle(self, node_from: str, node_to: str) -> Any:
+    def add_cres_bulk(self, cres: List[cre_defs.CRE]) -> None:
+        """Adds many CREs at once, CREs that already exist are updated
+        the same way add_cre updates them, only the missing ones are inserted.
+        This drops the links, use add_internal_link/add_link for those"""
+        # add_cre finds CREs by name and id or, without an id, by name and description
+        by_id: Dict[Tuple[str, str], CRE] = {}
+        by_description: Dict[Tuple[str, str], CRE] = {}
+
+        def index(entry: CRE) -> None:
+            name = entry.name.lower()
+            by_id.setdefault((name, entry.external_id), entry)
+            if entry.description is not None:
+                by_description.setdefault((name, entry.description.lower()), entry)
+
+        for entry in self.__existing(CRE, CRE.name, [cre.name for cre in cres]):
+            index(entry)
+        new: List[CRE] = []
+        for cre in cres:
+            if cre.id:
+                entry = by_id.get((cre.name.lower(), cre.id))
+            else:
+                entry = by_description.get((cre.name.lower(), cre.description.lower()))
+            if entry is None:
+                entry = CRE(
+                    description=cre.description,
+                    name=cre.name,
+                    external_id=cre.id,
+                    tags=_tag_set(cre.tags),
+                )
+                new.append(entry)
+            else:
+                _update_cre(entry, cre)
+            # the description may have just been filled in
+            index(entry)
+        self.__bulk_insert(
+            CRE,
+            [
+                {
+                    "name": entry.name,
+                    "external_id": entry.external_id,
+                    "description": entry.description,
+                    "tags": entry.tags,
+                }
+                for entry in new
+            ],
+        )
 
-        try:
-            existing_cycle = nx.find_cycle(self.cre_graph)
-            if existing_cycle:
-                logger.fatal(
-                    "Existing graph contains cycle,"
-                    "this not a recoverable error,"
-                    f" manual database actions are required {existing_cycle}"
+    def add_standards_bulk(self, standards: List[cre_defs.Standard]) -> None:
+        """Adds many standards at once, standards that already exist are updated
+        the same way add_standard updates them, only the missing ones are inserted.
+        This drops the links, use add_link for those"""
+
+        def key(*values: Optional[str]) -> Tuple[Optional[str], ...]:
+            # lower(NULL) matches nothing in add_standard's lookup, keep None apart from ""
+            return tuple(v.lower() if v is not None else None for v in values)
+
+        entries: Dict[Tuple[Optional[str], ...], Standard] = {}
+        for entry in self.__existing(
+            Standard, Standard.name, [standard.name for standard in standards]
+        ):
+            entries.setdefault(
+                key(entry.name, entry.section, entry.subsection, entry.version), entry
+            )
+        new: List[Standard] = []
+        for standard in standards:
+            k = key(
+                standard.name, standard.section, standard.subsection, standard.version
+            )
+            entry = entries.get(k)
+            if entry is None:
+                entry = Standard(
+                    name=standard.name,
+                    section=standard.section,
+                    subsection=standard.subsection,
+                    link=standard.hyperlink,
+                    version=standard.version,
+                    tags=_tag_set(standard.tags),
                 )
-                raise ValueError(
-                    "Existing graph contains cycle,"
-                    "this not a recoverable error,"
-                    f" manual database actions are required {existing_cycle}"
+                entries[k] = entry
+                new.append(entry)
+            elif entry.link != standard.hyperlink:
+                entry.link = standard.hyperlink
+        self.__bulk_insert(
+            Standard,
+            [
+                {
+                    "name": entry.name,
+                    "section": entry.section,
+                    "subsection": entry.subsection,
+                    "link": entry.link,
+                    "version": entry.version,
+                    "tags": entry.tags,
+                }
+                for entry in new
+            ],
+        )
+
+    def __existing(
+        self, model: DefaultMeta, name: sqla.Column, names: List[str]
+    ) -> Iterator[Any]:
+        """Yields the rows of model whose name matches one of names case insensitively,
+        in the order add_cre/add_standard would find them"""
+        lower_names = list(dict.fromkeys(n.lower() for n in names))
+        for i in range(0, len(lower_names), BULK_LOOKUP_BATCH_SIZE):
+            yield from (
+                self.session.query(model)
+                .filter(
+                    func.lower(name).in_(lower_names[i : i + BULK_LOOKUP_BATCH_SIZE])
                 )
-        except nx.exception.NetworkXNoCycle:
-            pass  # happy path, we don't want cycles
-        new_graph = self.cre_graph.copy()
-        new_graph.add_edge(node_from, node_to)
+                .order_by(model.id)
+            )
+
+    def __bulk_insert(self, model: DefaultMeta, rows: List[Dict[str, Any]]) -> None:
+        for i in range(0, len(rows), BULK_INSERT_BATCH_SIZE):
+            self.session.execute(
+                model.__table__.insert(), rows[i : i + BULK_INSERT_BATCH_SIZE]
+            )
+        # also writes the updates to the existing rows
+        self.__commit()
+        # executing statements directly does not trigger a flush
+        _bump_db_generation()
+        # nothing links to the new rows yet so the graph does not change
+
+    def __introduces_cycle(self, node_from: GraphNode, node_to: GraphNode) -> Any:
+        """Returns the path that the edge node_from -> node_to would turn into a cycle
+        or False, the graph is known to be acyclic so there is a cycle
+        only if node_to can already reach node_from"""
+        if node_from == node_to:
+            return [node_from]
         try:
-            return nx.find_cycle(new_graph)
-        except nx.NetworkXNoCycle:
+            return nx.shortest_path(self.cre_graph, node_to, node_from)
+        except (nx.NodeNotFound, nx.NetworkXNoPath):
             return False
 
     def add_internal_link(
@@ -693,26 +1119,21 @@ class Standard_collection:
             )
             return None
 
-        entry = (
-            self.session.query(InternalLinks)
-            .filter(
-                sqla.or_(
-                    sqla.and_(
-                        InternalLinks.cre == group.id, InternalLinks.group == cre.id
-                    ),
-                    sqla.and_(
-                        InternalLinks.cre == cre.id, InternalLinks.group == group.id
-                    ),
-                )
-            )
-            .first()
+        link_filter = sqla.or_(
+            sqla.and_(InternalLinks.cre == group.id, InternalLinks.group == cre.id),
+            sqla.and_(InternalLinks.cre == cre.id, InternalLinks.group == group.id),
         )
+        # only the type is needed to tell if the link exists and needs updating
+        entry = self.session.query(InternalLinks.type).filter(link_filter).first()
         if entry is not None:
             logger.debug(
                 f"knew of internal link {cre.name} == {group.name} of type {entry.type},updating to type {type.value}"
             )
-            entry.type = type.value
-            self.session.commit()
+            if entry.type != type.value:
+                self.session.query(InternalLinks).filter(link_filter).update(
+                    {InternalLinks.type: type.value}, synchronize_session="evaluate"
+                )
+            self.__commit()
 
             return None
 
@@ -722,13 +1143,13 @@ class Standard_collection:
                 f" {group.external_id}:{group.name}"
                 f" == {cre.external_id}:{cre.name} ,adding"
             )
-            cycle = self.__introduces_cycle(f"CRE: {group.id}", f"CRE: {cre.id}")
+            cycle = self.__introduces_cycle(("C", group.id), ("C", cre.id))
             if not cycle:
                 self.session.add(
                     InternalLinks(type=type.value, cre=cre.id, group=group.id)
                 )
-                self.session.commit()
-                self.cre_graph.add_edge(f"CRE: {group.id}", f"CRE: {cre.id}")
+                self.__commit()
+                self.__add_graph_edge(("C", group.id), ("C", cre.id))
             else:
                 logger.warning(
                     f"A link between CREs {group.external_id} and"
@@ -761,24 +1182,23 @@ class Standard_collection:
                 .first()
             )
 
-        entry = (
-            self.session.query(Links)
-            .filter(sqla.and_(Links.cre == cre.id, Links.standard == standard.id))
-            .first()
-        )
+        link_filter = sqla.and_(Links.cre == cre.id, Links.standard == standard.id)
+        # only the type is needed to tell if the link exists and needs updating
+        entry = self.session.query(Links.type).filter(link_filter).first()
         if entry:
             logger.debug(
                 f"knew of link {standard.name}:{standard.section}"
                 f"=={cre.name} of type {entry.type},"
                 f"updating type to {type.value}"
             )
-            entry.type = type.value
-            self.session.commit()
+            if entry.type != type.value:
+                self.session.query(Links).filter(link_filter).update(
+                    {Links.type: type.value}, synchronize_session="evaluate"
+                )
+            self.__commit()
             return
         else:
-            cycle = self.__introduces_cycle(
-                f"CRE: {cre.id}", f"Standard: {str(standard.id)}"
-            )
+            cycle = self.__introduces_cycle(("C", cre.id), ("S", standard.id))
             if not cycle:
                 logger.debug(
                     f"did not know of link {standard.id})"
@@ -788,9 +1208,7 @@ class Standard_collection:
                 self.session.add(
                     Links(type=type.value, cre=cre.id, standard=standard.id)
                 )
-                self.cre_graph.add_edge(
-                    f"CRE: {cre.id}", f"Standard: {str(standard.id)}"
-                )
+                self.__add_graph_edge(("C", cre.id), ("S", standard.id))
             else:
                 logger.warning(
                     f"A link between CRE {cre.external_id}"
@@ -799,49 +1217,94 @@ class Standard_collection:
                     f" would introduce cycle {cycle}, skipping"
                 )
                 logger.debug(f"{cycle}")
-        self.session.commit()
+        self.__commit()
 
     def find_path_between_standards(
         self, standard_source_id: int, standard_destination_id: int
     ) -> bool:
-        """One line method to return paths in a graph,
-        this starts getting complicated when we have more linktypes"""
-        res: bool = nx.has_path(
-            self.cre_graph.to_undirected(),
-            "Standard: " + str(standard_source_id),
-            "Standard: " + str(standard_destination_id),
+        """Returns whether the two standards are connected in the graph,
+        answered from the cached connected components.
+        This starts getting complicated when we have more linktypes"""
+        # standards nothing links to are not part of the graph
+        source = self.__component(("S", standard_source_id))
+        return source is not None and source == self.__component(
+            ("S", standard_destination_id)
         )
 
-        return res
-
     def gap_analysis(self, standards: List[str]) -> List[cre_defs.Standard]:
         """Since the CRE structure is a tree-like graph with
-        leaves being standards we can find the paths between standards
-        find_path_between_standards() is a graph-path-finding method
+        leaves being standards we can find the paths between standards,
+        two standards have a path between them if they share a connected component
         """
-        processed_standards = []
-        dbstands = []
-        for stand in standards:
-            dbstands.extend(
-                self.session.query(Standard).filter(Standard.name == stand).all()
-            )
-
-        for standard in dbstands:
-            working_standard = StandardFromDB(standard)
-            for other_standard in dbstands:
-                if standard.id == other_standard.id:
-                    continue
-                if self.find_path_between_standards(standard.id, other_standard.id):
-                    working_standard.add_link(
+        # fetch all the names in one query,
+        # then order the standards the way their names were asked for,
+        # anything that is not a name matches nothing
+        position: Dict[str, int] = {}
+        for i, name in enumerate(standards):
+            if isinstance(name, str):
+                position.setdefault(name, i)
+        if not position:
+            return []
+        dbstands = sorted(
+            self.session.query(Standard).filter(Standard.name.in_(list(position))),
+            key=lambda s: position[s.name],
+        )
+
+        # two standards are connected iff they are in the same component,
+        # bucket them by component so only connected pairs get visited
+        # standards nothing links to have no component and are not connected to anything
+        buckets: Dict[GraphNode, List[int]] = {}
+        for i, standard in enumerate(dbstands):
+            component = self.__component(("S", standard.id))
+            if component is not None:
+                buckets.setdefault(component, []).append(i)
+        # link targets are never modified, convert each standard once and share it
+        linked_documents = [StandardFromDB(s) for s in dbstands]
+        processed_standards = [StandardFromDB(s) for s in dbstands]
+        # being connected is symmetric, visit every pair once and link both ways,
+        # going through the pairs in order keeps each standard's links in order
+        for bucket in buckets.values():
+            for n, i in enumerate(bucket):
+                for j in bucket[n + 1 :]:
+                    processed_standards[i].add_link(
                         cre_defs.Link(
                             ltype=cre_defs.LinkTypes.LinkedTo,
-                            document=StandardFromDB(other_standard),
+                            document=linked_documents[j],
+                        )
+                    )
+                    processed_standards[j].add_link(
+                        cre_defs.Link(
+                            ltype=cre_defs.LinkTypes.LinkedTo,
+                            document=linked_documents[i],
                         )
                     )
-            processed_standards.append(working_standard)
         return processed_standards
 
+    def __fts_available(self) -> bool:
+        """whether the database has the full text indexes, older databases
+        get them from a migration and other dialects never have them"""
+        if self.__has_fts is None:
+            self.__has_fts = _fts_supported(self.session.get_bind()) and (
+                self.session.execute(
+                    "SELECT count(*) FROM sqlite_master"
+                    " WHERE type = 'table' AND name IN ('standard_fts', 'cre_fts')"
+                ).scalar()
+                == 2
+            )
+        return self.__has_fts
+
+    @staticmethod
+    def __fts_searchable(text: str) -> bool:
+        # LIKE treats % and _ as wildcards, keep those searches on LIKE
+        return len(text) >= FTS_MIN_LENGTH and "%" not in text and "_" not in text
+
     def text_search(self, text: str) -> List[Optional[cre_defs.Document]]:
+        """Returns the documents text_search_with_truncation finds for text"""
+        return self.text_search_with_truncation(text)[0]
+
+    def text_search_with_truncation(
+        self, text: str
+    ) -> Tuple[List[Optional[cre_defs.Document]], bool]:
         """Given a piece of text, tries to find the best match
         for the text in the database.
         Shortcuts:
@@ -851,59 +1314,145 @@ class Standard_collection:
                all entries of <name> and optionally, section/subsection
            '\d\d\d-\d\d\d' (two sets of 3 digits) will first try to match
                 CRE ids before it performs a free text search
-           Anything else will be a case insensitive LIKE query in the database
+           Anything else will be a case insensitive substring search in the database,
+                on sqlite it is answered by the full text indexes when there are any,
+                it returns at most TEXT_SEARCH_MAX_RESULTS documents, standards first
+        Returns the documents found and whether the fuzzy search hit the cap
+        and left out some of the matches
         """
         # structured text search first
-        cre_id_search = r"CRE(:| )(?P<id>\d+-\d+)"
-        cre_naked_id_search = r"\d\d\d-\d\d\d"
-        cre_name_search = r"CRE(:| )(?P<name>\w+)"
-        standard_search = r"Standard((:| )(?P<link>https?://[^\s]+))?((:| )(?P<val1>\w+))?((:| )(?P<val2>.+))?((:| )(?P<val3>.+))?"
-        match = re.search(cre_id_search, text, re.IGNORECASE)
-        if match:
-            return self.get_CREs(external_id=match.group("id"))
-
-        match = re.search(cre_naked_id_search, text, re.IGNORECASE)
-        if match:
-            return self.get_CREs(external_id=match.group())
-
-        match = re.search(cre_name_search, text, re.IGNORECASE)
-        if match:
-            return self.get_CREs(name=match.group("name"))
-
-        match = re.search(standard_search, text, re.IGNORECASE)
-        if match:
+        # a bare CRE id is the most common search, answer it without the regexes
+        if (
+            len(text) == 7
+            and text[3] == "-"
+            and text[:3].isdecimal()
+            and text[4:].isdecimal()
+        ):
+            return self.get_CREs(external_id=text), False
+
+        kind, match = _structured_search(text)
+        if kind == "cre_id":
+            return self.get_CREs(external_id=match.group("id")), False
+
+        if kind == "cre_naked_id":
+            return self.get_CREs(external_id=match.group(kind)), False
+
+        if kind == "cre_name":
+            return self.get_CREs(name=match.group("name")), False
+
+        if kind == "standard":
             link = match.group("link")
-            args = [match.group("val1"), match.group("val2"), match.group("val3")]
-            results = []
-            for combo in permutations(args, 3):
+            args = [match.group("val1"), match.group("val2"), None]
+            # dict keys dedupe the results and keep the order they were found in
+            results: Dict[cre_defs.Document, None] = {}
+            # with empty values many permutations repeat, only query the distinct ones
+            for combo in dict.fromkeys(permutations(args, 3)):
                 stands = self.get_standards(
                     name=combo[0], section=combo[1], subsection=combo[2], link=link
                 )
                 if stands:
-                    results.extend(stands)
-            return list(set(results))
-
-        # fuzzy matches second
-        args = [f"%{text}%", None, None, None]
-        results = []
-        for combo in permutations(args, 4):
-            stands = self.get_standards(
-                name=combo[0],
-                section=combo[1],
-                subsection=combo[2],
-                link=combo[3],
-                partial=True,
-            )
-            if stands:
-                results.extend(stands)
-        args = [f"%{text}%", None, None]
-        for combo in permutations(args, 3):
-            cres = self.get_CREs(
-                name=combo[0], external_id=combo[1], description=combo[2], partial=True
-            )
-            if cres:
-                results.extend(cres)
-        return list(set(results))
+                    results.update(dict.fromkeys(stands))
+            return list(results), False
+
+        # fuzzy matches second, anything with a column containing the text
+        if self.__fts_available() and self.__fts_searchable(text):
+            # a quoted trigram phrase matches the text anywhere in any column
+            phrase = '"{}"'.format(text.replace('"', '""'))
+            standards_match = Standard.id.in_(_fts_ids("standard", phrase))
+            cres_match = CRE.id.in_(_fts_ids("cre", phrase))
+        else:
+            pattern = f"%{text}%"
+            lower_pattern = pattern.lower()
+            standards_match = sqla.or_(
+                func.lower(Standard.name).like(lower_pattern),
+                func.lower(Standard.section).like(lower_pattern),
+                func.lower(Standard.subsection).like(lower_pattern),
+                Standard.link.like(pattern),
+            )
+            cres_match = sqla.or_(
+                func.lower(CRE.name).like(lower_pattern),
+                CRE.external_id.like(pattern),
+                func.lower(CRE.description).like(lower_pattern),
+            )
+        # each query asks for one more row than it can use to tell if there are more
+        matches: Dict[cre_defs.Document, None] = {}
+        dbstands = (
+            self.__standards_query()
+            .filter(standards_match)
+            .order_by(Standard.id)
+            .limit(TEXT_SEARCH_MAX_RESULTS + 1)
+            .all()
+        )
+        truncated = len(dbstands) > TEXT_SEARCH_MAX_RESULTS
+        for dbstand in dbstands[:TEXT_SEARCH_MAX_RESULTS]:
+            matches[self.__standard_with_links(dbstand)] = None
+        if not truncated:
+            remaining = TEXT_SEARCH_MAX_RESULTS - len(matches)
+            dbcres = (
+                self.__cres_query()
+                .filter(cres_match)
+                .order_by(CRE.id)
+                .limit(remaining + 1)
+                .all()
+            )
+            truncated = len(dbcres) > remaining
+            for dbcre in dbcres[:remaining]:
+                matches[self.__cre_with_links(dbcre)] = None
+        if truncated:
+            logger.info(
+                f"text search for {text} stopped at {TEXT_SEARCH_MAX_RESULTS} results"
+            )
+        return list(matches), truncated
+
+
+def _structured_search(text: str) -> Tuple[Optional[str], Any]:
+    """Returns the kind and match of the first of STRUCTURED_SEARCHES
+    matching text or (None, None) if none of them does"""
+    match = STRUCTURED_SEARCH.match(text)
+    if not match:
+        return None, None
+    # the kind's group encloses the groups of its search, so it is closed last
+    return match.lastgroup, match
+
+
+def _fts_ids(table: str, phrase: str) -> Any:
+    """Returns a subquery of the ids of the rows of table matching phrase"""
+    return sqla.text(
+        f"SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH :phrase"
+    ).bindparams(phrase=phrase)
+
+
+def _update_cre(entry: CRE, cre: cre_defs.CRE) -> None:
+    """Fills in the fields entry is missing from cre"""
+    if not entry.external_id:
+        if entry.external_id != cre.id:
+            raise ValueError(
+                f"Attempting to register existing CRE"
+                f"{entry.external_id}:{entry.name} with other ID {cre.id}"
+            )
+        entry.external_id = cre.id
+    if not entry.description:
+        entry.description = cre.description
+    if not entry.tags:
+        entry.tags = _tag_set(cre.tags)
+
+
+def _find_root(parents: Dict[GraphNode, GraphNode], node: GraphNode) -> GraphNode:
+    """Returns the root of node in a union-find forest"""
+    while parents[node] != node:
+        parents[node] = parents[parents[node]]  # path halving
+        node = parents[node]
+    return node
+
+
+def _tag_set(tags: Any) -> FrozenSet[str]:
+    """Returns tags, coma separated or an iterable, the way TagSet columns
+    hold them: stripped, deduplicated and without empty tags"""
+    if not tags:
+        return frozenset()
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    return frozenset(str(t).strip() for t in tags) - {""}
 
 
 def dbStandardFromStandard(standard: cre_defs.Standard) -> Standard:
@@ -918,24 +1467,21 @@ def dbStandardFromStandard(standard: cre_defs.Standard) -> Standard:
 
 def StandardFromDB(dbstandard: Standard) -> cre_defs.Standard:
 
-    tags = set()
-    if dbstandard.tags:
-        tags = set(dbstandard.tags.split(","))
     return cre_defs.Standard(
         name=dbstandard.name,
         section=dbstandard.section,
         subsection=dbstandard.subsection,
         hyperlink=dbstandard.link,
-        tags=tags,
+        tags=dbstandard.tags or frozenset(),
         version=dbstandard.version,
     )
 
 
 def CREfromDB(dbcre: CRE) -> cre_defs.CRE:
 
-    tags = set()
-    if dbcre.tags:
-        tags = set(dbcre.tags.split(","))
     return cre_defs.CRE(
-        name=dbcre.name, description=dbcre.description, id=dbcre.external_id, tags=tags
+        name=dbcre.name,
+        description=dbcre.description,
+        id=dbcre.external_id,
+        tags=dbcre.tags or frozenset(),
     )
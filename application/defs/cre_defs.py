@@ -4,6 +4,7 @@ from dataclasses import dataclass
 from enum import Enum
 from pprint import pprint
 from typing import (
+    AbstractSet,
     Any,
     Dict,
     List,
@@ -222,7 +223,7 @@ class Document:
     description: str
     name: str
     links: List[Link]
-    tags: Set[str]
+    tags: AbstractSet[str]
     metadata: Optional[Metadata]
 
     def __eq__(self, other: object) -> bool:
@@ -279,8 +280,9 @@ class Document:
                 for link in self.links
             ]  # links is of type Link
         if self.tags:
-            # purposefully make this a list instead of a set since sets are not json serializable
-            result["tags"] = list(self.tags)
+            # purposefully make this a list instead of a set since sets are not json serializable,
+            # sorted so that equal tag sets always serialize (and hash) the same
+            result["tags"] = sorted(self.tags)
         if self.metadata:
             result["metadata"] = self.metadata.todict()
         return result
@@ -301,7 +303,7 @@ class Document:
         id: str = "",
         description: str = "",
         links: List[Link] = [],
-        tags: List[str] = [],
+        tags: Union[List[str], AbstractSet[str]] = [],
         metadata: Optional[Metadata] = None,
     ) -> None:
         self.description = str(description)
@@ -312,10 +314,15 @@ class Document:
         else:
             self.name = str(name)
         self.links = links or []
-        if isinstance(tags, set) and "" in tags:
-            tags.remove("")
-
-        self.tags = tags if isinstance(tags, set) else set(tags)
+        if isinstance(tags, set):
+            tags.discard("")
+        elif isinstance(tags, frozenset):
+            # tags loaded from the database, immutable so they are shared instead of copied
+            if "" in tags:
+                tags = tags - {""}
+        else:
+            tags = set(tags)
+        self.tags = tags
         self.id = id
         self.metadata = metadata
         if not doctype and not self.doctype:
@@ -1,10 +1,12 @@
 import os
 import tempfile
+import textwrap
 import unittest
 import uuid
 from copy import copy, deepcopy
 from pprint import pprint
 from typing import Dict, Union
+from unittest import mock
 
 import yaml
 
@@ -108,12 +110,78 @@ class TestDB(unittest.TestCase):
         self.assertEqual(self.collection.get_by_tags([]), [])
         self.assertEqual(self.collection.get_by_tags(["this should not be a tag"]), [])
 
+    def test_case_insensitive_lookups(self) -> None:
+        """get_standards/get_CREs and the add_* duplicate checks ignore case,
+        the lookups of link endpoints and gap_analysis match names exactly"""
+        dbstandard = self.collection.get_standards(name="BarStand")[0]
+        self.assertEqual(self.collection.get_standards(name="barstand"), [dbstandard])
+        self.assertEqual(
+            self.collection.get_standards(name="bar%", partial=True), [dbstandard]
+        )
+        dbcre = self.collection.get_CREs(name="CREname")[0]
+        self.assertEqual(self.collection.get_CREs(name="crename"), [dbcre])
+
+        stand = self.collection.add_standard(
+            defs.Standard(name="barstand", section="foostand", subsection="4.5.6")
+        )
+        self.assertEqual(stand.name, "BarStand")
+        cre = self.collection.add_cre(
+            defs.CRE(id="111-000", description="CREdesc", name="crename")
+        )
+        self.assertEqual(cre.name, "CREname")
+
+        self.assertIsNone(self.collection.find_cres_of_cre(db.CRE(name="crename")))
+        self.assertEqual(
+            len(self.collection.find_cres_of_cre(db.CRE(name="CREname"))), 1
+        )
+        self.assertEqual(self.collection.gap_analysis(["barstand"]), [])
+        self.assertEqual(len(self.collection.gap_analysis(["BarStand"])), 1)
+
     def test_get_standards_names(self) -> None:
 
         result = self.collection.get_standards_names()
         expected = ["BarStand", "Unlinked"]
         self.assertEqual(expected, result)
 
+        # adding a standard invalidates the cached names
+        self.collection.add_standard(defs.Standard(name="NewStand", section="1"))
+        result = self.collection.get_standards_names()
+        self.assertCountEqual(expected + ["NewStand"], result)
+
+        # so does a pending change nothing has flushed yet
+        dbstandard = (
+            self.collection.session.query(db.Standard)
+            .filter(db.Standard.name == "NewStand")
+            .one()
+        )
+        dbstandard.name = "RenamedStand"
+        result = self.collection.get_standards_names()
+        self.assertCountEqual(expected + ["RenamedStand"], result)
+
+    def test_cache_shared_between_instances(self) -> None:
+        """the web app creates a collection per request,
+        the cached values outlive it until the database changes"""
+        reader = db.Standard_collection()
+        graph = reader.cre_graph
+        self.assertIs(db.Standard_collection().cre_graph, graph)
+        self.assertEqual(
+            db.Standard_collection().get_standards_names(),
+            reader.get_standards_names(),
+        )
+
+        # writers copy the graph instead of changing it under the readers
+        dbstandard = self.collection.add_standard(
+            defs.Standard(name="NewStand", section="1")
+        )
+        dbcre = (
+            self.collection.session.query(db.CRE).filter(db.CRE.name == "CREname").one()
+        )
+        self.collection.add_link(cre=dbcre, standard=dbstandard)
+        self.assertNotIn(("S", dbstandard.id), graph)
+        self.assertIn(("S", dbstandard.id), self.collection.cre_graph)
+        self.assertIn(("S", dbstandard.id), db.Standard_collection().cre_graph)
+        self.assertIn("NewStand", db.Standard_collection().get_standards_names())
+
     def test_get_max_internal_connections(self) -> None:
         self.assertEqual(self.collection.get_max_internal_connections(), 1)
 
@@ -208,6 +276,122 @@ class TestDB(unittest.TestCase):
             doc = yaml.safe_load(f)
             self.assertDictEqual(cre, doc)
 
+    def test_export_golden(self) -> None:
+        """the exported files byte for byte,
+        the output of the yaml dumper must not change with the dumper used"""
+        dbgroup = (
+            self.collection.session.query(db.CRE)
+            .filter(db.CRE.name == "GroupName")
+            .one()
+        )
+        dbcre = self.collection.add_cre(
+            defs.CRE(
+                id="222-000",
+                description="\u00dcn\u00efcode: d\u00e9scription",
+                name="Slash/CRE",
+                tags=["b", "a"],
+            )
+        )
+        dbstandard = self.collection.add_standard(
+            defs.Standard(
+                name="Versioned",
+                section="1.2",
+                subsection="",
+                version="4.0",
+                hyperlink="https://example.com/v",
+            )
+        )
+        self.collection.add_link(
+            cre=dbcre, standard=dbstandard, type=defs.LinkTypes.PartOf
+        )
+        self.collection.add_internal_link(group=dbgroup, cre=dbcre)
+        expected = {
+            "CREname.yaml": """\
+                description: CREdesc
+                doctype: CRE
+                id: 111-000
+                links:
+                - document:
+                    description: Groupdesc
+                    doctype: CRE
+                    id: 111-001
+                    name: GroupName
+                  type: SAME
+                - document:
+                    doctype: Standard
+                    hyperlink: https://example.com
+                    name: BarStand
+                    section: FooStand
+                    subsection: 4.5.6
+                    version: ''
+                  type: SAME
+                name: CREname
+                """,
+            "GroupName.yaml": """\
+                description: Groupdesc
+                doctype: CRE
+                id: 111-001
+                links:
+                - document:
+                    description: CREdesc
+                    doctype: CRE
+                    id: 111-000
+                    name: CREname
+                  type: SAME
+                - document:
+                    description: "\\xDCn\\xEFcode: d\\xE9scription"
+                    doctype: CRE
+                    id: 222-000
+                    name: Slash/CRE
+                    tags:
+                    - a
+                    - b
+                  type: SAME
+                name: GroupName
+                """,
+            "Slash-CRE.yaml": """\
+                description: "\\xDCn\\xEFcode: d\\xE9scription"
+                doctype: CRE
+                id: 222-000
+                links:
+                - document:
+                    description: Groupdesc
+                    doctype: CRE
+                    id: 111-001
+                    name: GroupName
+                  type: SAME
+                - document:
+                    doctype: Standard
+                    hyperlink: https://example.com/v
+                    name: Versioned
+                    section: '1.2'
+                    subsection: ''
+                    version: '4.0'
+                  type: Is Part Of
+                name: Slash/CRE
+                tags:
+                - a
+                - b
+                """,
+            "Unlinked.yaml": """\
+                doctype: Standard
+                hyperlink: https://example.com
+                name: Unlinked
+                section: Unlinked
+                subsection: 4.5.6
+                version: ''
+                """,
+        }
+
+        loc = tempfile.mkdtemp()
+        self.collection.export(loc)
+
+        self.maxDiff = None
+        self.assertCountEqual(os.listdir(loc), expected.keys())
+        for title, content in expected.items():
+            with open(os.path.join(loc, title), "r", encoding="utf8") as f:
+                self.assertEqual(f.read(), textwrap.dedent(content))
+
     def test_StandardFromDB(self) -> None:
         expected = defs.Standard(
             name="foo",
@@ -312,6 +496,134 @@ class TestDB(unittest.TestCase):
 
         # standards match on all of name,section, subsection <-- if you change even one of them it's a new entry
 
+    def test_add_bulk(self) -> None:
+        nodesc = self.collection.add_cre(defs.CRE(id="222-100", name="nodesc"))
+        cres = [
+            defs.CRE(id=f"222-00{i}", description=f"bulkdesc{i}", name=f"bulk{i}")
+            for i in range(3)
+        ]
+        # already exist, matched case insensitively like add_cre does
+        cres.append(defs.CRE(id="111-000", description="changed", name="crename"))
+        cres.append(defs.CRE(id="222-100", description="filled in", name="NoDesc"))
+        # the same new CRE twice is inserted once
+        cres.append(defs.CRE(id="222-000", description="bulkdesc0", name="Bulk0"))
+        self.collection.add_cres_bulk(cres)
+
+        self.assertEqual(
+            self.collection.session.query(db.CRE)
+            .filter(db.CRE.name.like("bulk%"))
+            .count(),
+            3,
+        )
+        self.assertEqual(self.collection.session.query(db.CRE).count(), 6)
+        existing = (
+            self.collection.session.query(db.CRE).filter(db.CRE.name == "CREname").all()
+        )
+        self.assertEqual(len(existing), 1)
+        self.assertEqual(existing[0].description, "CREdesc")
+        self.assertEqual(nodesc.description, "filled in")
+
+        standards = [
+            defs.Standard(name="BulkStand", section=str(i), tags=["t1", "t2"])
+            for i in range(3)
+        ]
+        # already exists, only the hyperlink gets updated like add_standard does
+        standards.append(
+            defs.Standard(
+                name="barstand",
+                section="foostand",
+                subsection="4.5.6",
+                hyperlink="https://example.com/new",
+            )
+        )
+        self.collection.add_standards_bulk(standards)
+
+        self.assertEqual(
+            self.collection.session.query(db.Standard)
+            .filter(db.Standard.name == "BulkStand")
+            .count(),
+            3,
+        )
+        barstands = (
+            self.collection.session.query(db.Standard)
+            .filter(db.Standard.name == "BarStand")
+            .all()
+        )
+        self.assertEqual(len(barstands), 1)
+        self.assertEqual(barstands[0].link, "https://example.com/new")
+        self.assertIn("BulkStand", self.collection.get_standards_names())
+
+    def test_bulk(self) -> None:
+        with self.collection.bulk():
+            self.collection.add_cre(
+                defs.CRE(id="333-000", description="bulk", name="bulkCRE")
+            )
+        # committed at the end of the block, survives a rollback
+        self.collection.session.rollback()
+        self.assertIsNotNone(
+            self.collection.session.query(db.CRE)
+            .filter(db.CRE.name == "bulkCRE")
+            .first()
+        )
+
+        with self.assertRaises(ValueError):
+            with self.collection.bulk():
+                self.collection.add_cre(
+                    defs.CRE(id="333-001", description="bulk", name="rolledBackCRE")
+                )
+                raise ValueError("abort")
+        self.assertIsNone(
+            self.collection.session.query(db.CRE)
+            .filter(db.CRE.name == "rolledBackCRE")
+            .first()
+        )
+
+    def test_read_links_added_in_bulk(self) -> None:
+        """links are added by id, reading the documents they link
+        in the same transaction still returns them"""
+        with self.collection.bulk():
+            self.assertEqual(
+                len(self.collection.get_CREs(name="GroupName")[0].links), 1
+            )
+            dbstandard = self.collection.add_standard(
+                defs.Standard(name="NewStand", section="1")
+            )
+            self.assertEqual(
+                self.collection.get_standards(name="NewStand")[0].links, []
+            )
+            dbgroup = (
+                self.collection.session.query(db.CRE)
+                .filter(db.CRE.name == "GroupName")
+                .one()
+            )
+            self.collection.add_link(cre=dbgroup, standard=dbstandard)
+
+            self.assertEqual(
+                len(self.collection.get_CREs(name="GroupName")[0].links), 2
+            )
+            self.assertEqual(
+                len(self.collection.get_standards(name="NewStand")[0].links), 1
+            )
+
+    def test_raise_on_lazy(self) -> None:
+        """the read paths load every relationship they use eagerly,
+        a lazy load (an N+1 query) would raise here"""
+        collection = db.Standard_collection(raise_on_lazy=True)
+
+        self.assertEqual(len(collection.get_CREs(name="CREname")[0].links), 2)
+        self.assertEqual(len(collection.get_CREs(name="GroupName")[0].links), 1)
+        self.assertEqual(len(collection.get_standards(name="BarStand")[0].links), 1)
+        total_pages, stands, _ = collection.get_standards_with_pagination(
+            name="BarStand"
+        )
+        self.assertEqual(len(stands[0].links), 1)
+        self.assertEqual(len(collection.export(tempfile.mkdtemp())), 3)
+        self.assertEqual(len(collection.text_search("CRE:111-000")[0].links), 2)
+        self.assertEqual(len(collection.text_search("Standard:BarStand")), 1)
+        self.assertEqual(
+            sorted(len(doc.links) for doc in collection.text_search("desc")), [1, 2]
+        )
+
     def find_cres_of_cre(self) -> None:
         dbcre = db.CRE(description="CREdesc1", name="CREname1")
         groupless_cre = db.CRE(description="CREdesc2", name="CREname2")
@@ -359,6 +671,24 @@ class TestDB(unittest.TestCase):
         groups = self.collection.find_cres_of_cre(groupless_cre)
         self.assertIsNone(groups)
 
+    def test_find_cres_of_cre_shared_name(self) -> None:
+        """only the groups of the first CRE with the name are returned, once each"""
+        first = db.CRE(external_id="222-001", description="first", name="Shared")
+        second = db.CRE(external_id="222-002", description="second", name="Shared")
+        dbgroup = db.CRE(description="Groupdesc1", name="GroupName1")
+        dbgroup2 = db.CRE(description="Groupdesc2", name="GroupName2")
+        for dbcre in (first, second, dbgroup, dbgroup2):
+            self.collection.session.add(dbcre)
+        self.collection.session.commit()
+        self.collection.session.add(db.InternalLinks(cre=first.id, group=dbgroup.id))
+        self.collection.session.add(db.InternalLinks(cre=second.id, group=dbgroup.id))
+        self.collection.session.add(db.InternalLinks(cre=second.id, group=dbgroup2.id))
+        self.collection.session.commit()
+
+        self.assertEqual(
+            self.collection.find_cres_of_cre(db.CRE(name="Shared")), [dbgroup]
+        )
+
     def test_find_cres_of_standard(self) -> None:
         dbcre = db.CRE(description="CREdesc1", name="CREname1")
         dbgroup = db.CRE(description="CREdesc2", name="CREname2")
@@ -796,6 +1126,27 @@ class TestDB(unittest.TestCase):
             # unfortunately named, asserts element and count equality
             self.assertCountEqual(res, expected_vals)
 
+        # nothing asked for and anything that is not a name match nothing
+        self.assertEqual(collection.gap_analysis([]), [])
+        self.assertEqual(collection.gap_analysis([None]), [])  # type: ignore
+        self.assertCountEqual(
+            collection.gap_analysis(["SA", None, "SW"]),  # type: ignore
+            expected["SA,SW"],
+        )
+
+        # CW joins the CC tree, SW1 must become reachable from SA1
+        self.assertFalse(
+            collection.find_path_between_standards(
+                standards["dbsa1"].id, standards["dbsw1"].id
+            )
+        )
+        collection.add_internal_link(group=cres["dbcc"], cre=cres["dbcw"])
+        self.assertTrue(
+            collection.find_path_between_standards(
+                standards["dbsa1"].id, standards["dbsw1"].id
+            )
+        )
+
     def test_add_internal_link(self) -> None:
         """test that internal links are added successfully,
         edge cases:
@@ -939,6 +1290,36 @@ class TestDB(unittest.TestCase):
         for k, val in expected.items():
             self.assertCountEqual(self.collection.text_search(k), val)
 
+        # fuzzy searches stop at TEXT_SEARCH_MAX_RESULTS documents, standards first
+        with mock.patch.object(db, "TEXT_SEARCH_MAX_RESULTS", 2):
+            self.assertEqual(
+                self.collection.text_search_with_truncation("tsSection"),
+                ([s1, s2], True),
+            )
+        with mock.patch.object(db, "TEXT_SEARCH_MAX_RESULTS", 3):
+            self.assertEqual(
+                self.collection.text_search_with_truncation("tsSection"),
+                ([s1, s2, s3], True),
+            )
+        with mock.patch.object(db, "TEXT_SEARCH_MAX_RESULTS", 4):
+            self.assertEqual(
+                self.collection.text_search_with_truncation("tsSection"),
+                ([s1, s2, s3, cre], False),
+            )
+        self.assertEqual(
+            self.collection.text_search_with_truncation("Standard:tsSection"),
+            ([s1, s2], False),
+        )
+
+    def test_text_search_precedence(self) -> None:
+        """the structured searches are tried in order over the whole text,
+        an id anywhere in it wins over a name that comes first"""
+        cre = self.collection.get_CREs(external_id="111-000")
+        group = self.collection.get_CREs(external_id="111-001")
+        self.assertEqual(self.collection.text_search("CRE:GroupName 111-000"), cre)
+        self.assertEqual(self.collection.text_search("CRE:GroupName"), group)
+        self.assertEqual(self.collection.text_search("Standard CRE:111-001"), group)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -137,6 +137,16 @@ class TestCreDefs(unittest.TestCase):
         with self.assertRaises(KeyError):
             defs.LinkTypes.from_str("asdf")
 
+    def test_document_tags(self) -> None:
+        tags = frozenset(["a", "b"])
+        # frozensets are shared, not copied
+        self.assertIs(defs.CRE(name="c", tags=tags).tags, tags)
+        self.assertEqual(
+            defs.CRE(name="c", tags=frozenset(["a", ""])).tags, frozenset(["a"])
+        )
+        self.assertEqual(defs.CRE(name="c", tags={"a", ""}).tags, {"a"})
+        self.assertEqual(defs.CRE(name="c", tags=["a", "b"]).tags, {"a", "b"})
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -483,8 +483,9 @@ def parse_hierarchical_export_format(
 
         if not is_empty(mapping.get("CRE Tags")):
 
-            for x in mapping.pop("CRE Tags").split(","):
-                cre.tags.add(x.strip())
+            cre.tags = cre.tags | {
+                x.strip() for x in mapping.pop("CRE Tags").split(",")
+            }
         update_cre_in_links(cres, cre)
 
         # TODO(spyros): temporary until we agree what we want to do with tags
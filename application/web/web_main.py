@@ -134,14 +134,18 @@ def text_search() -> Any:
               all entries of <name> and optionally, section/subsection
         * '\d\d\d-\d\d\d' (two sets of 3 digits) will first try to match
                            CRE ids before it performs a free text search
-        Anything else will be a case insensitive LIKE query in the database
+        Anything else will be a case insensitive LIKE query in the database,
+            it returns at most db.TEXT_SEARCH_MAX_RESULTS documents,
+            the X-Results-Truncated header tells if there were more
     """
     database = db.Standard_collection()
     text = request.args.get("text")
-    documents = database.text_search(text)
+    documents, truncated = database.text_search_with_truncation(text)
     if documents:
         res = [doc.todict() for doc in documents]
-        return jsonify(res)
+        response = jsonify(res)
+        response.headers["X-Results-Truncated"] = str(truncated).lower()
+        return response
     else:
         abort(404)
 
@@ -0,0 +1,45 @@
+"""lowercase lookup indexes
+
+Revision ID: 3b6e4c2a9f10
+Revises: 7a17989aa1e3
+Create Date: 2026-10-15 22:24:10.113542
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "3b6e4c2a9f10"
+down_revision = "7a17989aa1e3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_standard_lower_name_section_subsection_version",
+        "standard",
+        [
+            sa.text("lower(name)"),
+            sa.text("lower(section)"),
+            sa.text("lower(subsection)"),
+            sa.text("lower(version)"),
+        ],
+    )
+    op.create_index(
+        "ix_standard_lower_section", "standard", [sa.text("lower(section)")]
+    )
+    op.create_index(
+        "ix_standard_lower_subsection", "standard", [sa.text("lower(subsection)")]
+    )
+    op.create_index("ix_cre_lower_name", "cre", [sa.text("lower(name)")])
+
+
+def downgrade():
+    op.drop_index("ix_cre_lower_name", table_name="cre")
+    op.drop_index("ix_standard_lower_subsection", table_name="standard")
+    op.drop_index("ix_standard_lower_section", table_name="standard")
+    op.drop_index(
+        "ix_standard_lower_name_section_subsection_version", table_name="standard"
+    )
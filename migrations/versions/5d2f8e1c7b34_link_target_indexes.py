@@ -0,0 +1,26 @@
+"""link target indexes
+
+Revision ID: 5d2f8e1c7b34
+Revises: 3b6e4c2a9f10
+Create Date: 2026-10-15 23:41:52.604218
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "5d2f8e1c7b34"
+down_revision = "3b6e4c2a9f10"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_crelinks_cre", "crelinks", ["cre"])
+    op.create_index("ix_links_standard", "links", ["standard"])
+
+
+def downgrade():
+    op.drop_index("ix_links_standard", table_name="links")
+    op.drop_index("ix_crelinks_cre", table_name="crelinks")
@@ -0,0 +1,24 @@
+"""cre external id index
+
+Revision ID: 8c41d7b2e5a6
+Revises: 5d2f8e1c7b34
+Create Date: 2026-10-16 01:12:37.918405
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "8c41d7b2e5a6"
+down_revision = "5d2f8e1c7b34"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_cre_external_id", "cre", ["external_id"])
+
+
+def downgrade():
+    op.drop_index("ix_cre_external_id", table_name="cre")
@@ -0,0 +1,70 @@
+"""fuzzy search fts indexes
+
+Revision ID: a9e3f6c1d2b7
+Revises: 8c41d7b2e5a6
+Create Date: 2026-10-16 02:03:11.274316
+
+"""
+
+import sqlite3
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "a9e3f6c1d2b7"
+down_revision = "8c41d7b2e5a6"
+branch_labels = None
+depends_on = None
+
+# trigram full text indexes are a sqlite (3.34+, built with FTS5) feature,
+# other databases keep using LIKE
+fts_columns = {
+    "standard": ("name", "section", "subsection", "link"),
+    "cre": ("name", "external_id", "description"),
+}
+
+
+def fts_supported():
+    bind = op.get_bind()
+    if bind.dialect.name != "sqlite" or sqlite3.sqlite_version_info < (3, 34):
+        return False
+    # FTS5 is optional at compile time
+    return bool(
+        bind.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar()
+    )
+
+
+def upgrade():
+    if not fts_supported():
+        return
+    for table, columns in fts_columns.items():
+        names = ", ".join(columns)
+        new = ", ".join(f"new.{c}" for c in columns)
+        old = ", ".join(f"old.{c}" for c in columns)
+        delete = f"INSERT INTO {table}_fts({table}_fts, rowid, {names}) VALUES('delete', old.id, {old});"
+        insert = f"INSERT INTO {table}_fts(rowid, {names}) VALUES (new.id, {new});"
+        op.execute(
+            f"CREATE VIRTUAL TABLE {table}_fts USING fts5({names}, "
+            f"content='{table}', content_rowid='id', tokenize='trigram')"
+        )
+        op.execute(
+            f"CREATE TRIGGER {table}_fts_ai AFTER INSERT ON {table} BEGIN {insert} END"
+        )
+        op.execute(
+            f"CREATE TRIGGER {table}_fts_ad AFTER DELETE ON {table} BEGIN {delete} END"
+        )
+        op.execute(
+            f"CREATE TRIGGER {table}_fts_au AFTER UPDATE ON {table} BEGIN {delete} {insert} END"
+        )
+        # index the rows that already exist
+        op.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES('rebuild')")
+
+
+def downgrade():
+    if not fts_supported():
+        return
+    for table in fts_columns:
+        for trigger in ("ai", "ad", "au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{trigger}")
+        op.execute(f"DROP TABLE IF EXISTS {table}_fts")